@@ -1,20 +1,50 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime, timedelta
 import csv
 import io
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 from io import BytesIO
-import zipfile
-import xlsxwriter
 import os
 
+# pandas, numpy and zipfile are imported inside the functions that use them, and xlsxwriter
+# is loaded by pandas through ExcelWriter, so none of them is needed until "Process" is clicked.
+# Streamlit does not import pandas on its own, so this keeps the first page load light.
+
 # Set Streamlit page configuration to wide layout
 st.set_page_config(layout="wide", page_title="Hilton Accuracy Check Tool")
 
+# Accuracy colour bands shared by the on-screen tables and the Excel export:
+# below 96% is red, 96-98% is yellow, 98% and above is green
+ACCURACY_THRESHOLDS = [0.96, 0.98]
+ACCURACY_COLORS = ['#BF3100', '#F2A541', '#469798']
+
+# Compute background colours for a whole column of accuracy fractions at once by binning against the thresholds
+def accuracy_band_styles(column, color_missing=True):
+    import numpy as np
+
+    values = column.to_numpy(dtype=float)
+    missing = np.isnan(values)
+    styles = np.array([f'background-color: {color}' for color in ACCURACY_COLORS])
+    # Missing values fall in the lowest band, like the blank cells the Excel rules colour red
+    bands = np.where(missing, 0, np.digitize(values, ACCURACY_THRESHOLDS))
+    if color_missing:
+        return styles[bands]
+    return np.where(missing, '', styles[bands])
+
+# Add the accuracy colour formats to an xlsxwriter workbook
+def add_accuracy_formats(workbook):
+    return [workbook.add_format({'bg_color': color, 'font_color': '#FFFFFF'}) for color in ACCURACY_COLORS]
+
+# Apply the accuracy colour bands as conditional formats on a worksheet range
+def apply_accuracy_conditional_formats(worksheet, cell_range, formats):
+    # Highest band first so it takes priority where ranges touch at a threshold
+    for threshold, band_format in zip(reversed(ACCURACY_THRESHOLDS), reversed(formats[1:])):
+        worksheet.conditional_format(cell_range, {'type': 'cell', 'criteria': '>=', 'value': threshold, 'format': band_format})
+    worksheet.conditional_format(cell_range, {'type': 'cell', 'criteria': '<', 'value': ACCURACY_THRESHOLDS[0], 'format': formats[0]})
+
 # Repair function for corrupted Excel files using in-memory operations
 def repair_xlsx(file):
+    import zipfile
+
     repaired_file = BytesIO()
     with zipfile.ZipFile(file, 'r') as zip_ref:
         with zipfile.ZipFile(repaired_file, 'w') as repaired_zip:
@@ -31,6 +61,8 @@ def repair_xlsx(file):
 
 # Function to detect delimiter and load CSV file
 def load_csv(file):
+    import pandas as pd
+
     if file is None:
         st.error("No CSV file uploaded.")
         return pd.DataFrame()
@@ -48,6 +80,8 @@ def load_csv(file):
 
 # Function to dynamically find headers and process data
 def dynamic_process_files(csv_file, excel_file, excel_file_2, inncode, perspective_date, apply_vat, vat_rate):
+    import pandas as pd
+
     csv_data = load_csv(csv_file)
     if csv_data.empty:
         st.warning("CSV file could not be processed. Please check the file and try again.")
@@ -252,46 +286,28 @@ def dynamic_process_files(csv_file, excel_file, excel_file_2, inncode, perspecti
         future_results_df, future_accuracy_rn, future_accuracy_rev = pd.DataFrame(), 0, 0
 
     if not results_df.empty or not future_results_df.empty:
+        # Keep the accuracies as fractions so the colours use the same values as the Excel export
         accuracy_matrix = pd.DataFrame({
             'Metric': ['RNs', 'Revenue'],
-            'Past': [f'{past_accuracy_rn:.2f}%', f'{past_accuracy_rev:.2f}%'] if not results_df.empty else ['N/A', 'N/A'],
-            'Future': [f'{future_accuracy_rn:.2f}%', f'{future_accuracy_rev:.2f}%'] if not future_results_df.empty else ['N/A', 'N/A']
+            'Past': [past_accuracy_rn / 100, past_accuracy_rev / 100] if not results_df.empty else [float('nan')] * 2,
+            'Future': [future_accuracy_rn / 100, future_accuracy_rev / 100] if not future_results_df.empty else [float('nan')] * 2
         })
 
-        def color_scale(val):
-            if isinstance(val, str) and '%' in val:
-                val = float(val.strip('%'))
-                if val >= 98:
-                    return 'background-color: #469798'
-                elif 95 <= val < 98:
-                    return 'background-color: #F2A541'
-                else:
-                    return 'background-color: #BF3100'
-            return ''
-
-        accuracy_matrix_styled = accuracy_matrix.style.applymap(color_scale, subset=['Past', 'Future'])
+        accuracy_matrix_styled = accuracy_matrix.style.format(
+            '{:.2%}', subset=['Past', 'Future'], na_rep='N/A'
+        ).apply(accuracy_band_styles, subset=['Past', 'Future'], color_missing=False)
         st.subheader(f'Accuracy Matrix for the hotel with code: {inncode}')
         st.dataframe(accuracy_matrix_styled, use_container_width=True)
 
     # Update display for past results with percentage formatting and color coding
     if not results_df.empty:
         st.subheader('Detailed Accuracy Comparison (Past)')
-        
-        # Define color scaling function for Streamlit
-        def color_scale(val):
-            if val >= 0.98:
-                color = '#469798'  # Green
-            elif 0.96 <= val < 0.98:
-                color = '#F2A541'  # Yellow
-            else:
-                color = '#BF3100'  # Red
-            return f'background-color: {color}'
 
         # Format the DataFrame with percentages and apply color coding
         past_styled = results_df.style.format({
             'RN Percentage': '{:.2%}',
             'Rev Percentage': '{:.2%}'
-        }).applymap(color_scale, subset=['RN Percentage', 'Rev Percentage'])
+        }).apply(accuracy_band_styles, subset=['RN Percentage', 'Rev Percentage'])
         
         st.dataframe(past_styled, use_container_width=True)
 
@@ -303,7 +319,7 @@ def dynamic_process_files(csv_file, excel_file, excel_file_2, inncode, perspecti
         future_styled = future_results_df.style.format({
             'RN Percentage': '{:.2%}',
             'Rev Percentage': '{:.2%}'
-        }).applymap(color_scale, subset=['RN Percentage', 'Rev Percentage'])
+        }).apply(accuracy_band_styles, subset=['RN Percentage', 'Rev Percentage'])
         
         st.dataframe(future_styled, use_container_width=True)
 
@@ -311,6 +327,8 @@ def dynamic_process_files(csv_file, excel_file, excel_file_2, inncode, perspecti
 
 # Function to create Excel file for download with color formatting and accuracy matrix
 def create_excel_download(results_df, future_results_df, base_filename, past_accuracy_rn, past_accuracy_rev, future_accuracy_rn, future_accuracy_rev):
+    import pandas as pd
+
     output = BytesIO()
     with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
         workbook = writer.book
@@ -326,22 +344,15 @@ def create_excel_download(results_df, future_results_df, base_filename, past_acc
         worksheet = writer.sheets['Accuracy Matrix']
 
         # Define formats
-        format_green = workbook.add_format({'bg_color': '#469798', 'font_color': '#FFFFFF'})
-        format_yellow = workbook.add_format({'bg_color': '#F2A541', 'font_color': '#FFFFFF'})
-        format_red = workbook.add_format({'bg_color': '#BF3100', 'font_color': '#FFFFFF'})
+        accuracy_formats = add_accuracy_formats(workbook)
         format_percent = workbook.add_format({'num_format': '0.00%'})  # Percentage format
 
         # Apply percentage format to the relevant cells
         worksheet.set_column('B:C', None, format_percent)  # Set percentage format
 
-        # Apply simplified conditional formatting for Accuracy Matrix
-        worksheet.conditional_format('B3:B4', {'type': 'cell', 'criteria': '<', 'value': 0.96, 'format': format_red})
-        worksheet.conditional_format('B3:B4', {'type': 'cell', 'criteria': 'between', 'minimum': 0.96, 'maximum': 0.9799, 'format': format_yellow})
-        worksheet.conditional_format('B3:B4', {'type': 'cell', 'criteria': '>=', 'value': 0.98, 'format': format_green})
-
-        worksheet.conditional_format('C3:C4', {'type': 'cell', 'criteria': '<', 'value': 0.96, 'format': format_red})
-        worksheet.conditional_format('C3:C4', {'type': 'cell', 'criteria': 'between', 'minimum': 0.96, 'maximum': 0.9799, 'format': format_yellow})
-        worksheet.conditional_format('C3:C4', {'type': 'cell', 'criteria': '>=', 'value': 0.98, 'format': format_green})
+        # Apply conditional formatting for Accuracy Matrix
+        apply_accuracy_conditional_formats(worksheet, 'B3:B4', accuracy_formats)
+        apply_accuracy_conditional_formats(worksheet, 'C3:C4', accuracy_formats)
 
         # Write past and future results to separate sheets
         if not results_df.empty:
@@ -367,20 +378,9 @@ def create_excel_download(results_df, future_results_df, base_filename, past_acc
             worksheet_past.set_column('E:E', None, format_percent)  # Percentage
             worksheet_past.set_column('I:I', None, format_percent)  # Percentage
 
-            # Apply simplified conditional formatting to percentages in columns E and I
-            worksheet_past.conditional_format('E2:E{}'.format(len(results_df) + 1),
-                                              {'type': 'cell', 'criteria': '<', 'value': 0.96, 'format': format_red})
-            worksheet_past.conditional_format('E2:E{}'.format(len(results_df) + 1),
-                                              {'type': 'cell', 'criteria': 'between', 'minimum': 0.96, 'maximum': 0.9799, 'format': format_yellow})
-            worksheet_past.conditional_format('E2:E{}'.format(len(results_df) + 1),
-                                              {'type': 'cell', 'criteria': '>=', 'value': 0.98, 'format': format_green})
-
-            worksheet_past.conditional_format('I2:I{}'.format(len(results_df) + 1),
-                                              {'type': 'cell', 'criteria': '<', 'value': 0.96, 'format': format_red})
-            worksheet_past.conditional_format('I2:I{}'.format(len(results_df) + 1),
-                                              {'type': 'cell', 'criteria': 'between', 'minimum': 0.96, 'maximum': 0.9799, 'format': format_yellow})
-            worksheet_past.conditional_format('I2:I{}'.format(len(results_df) + 1),
-                                              {'type': 'cell', 'criteria': '>=', 'value': 0.98, 'format': format_green})
+            # Apply conditional formatting to percentages in columns E and I
+            apply_accuracy_conditional_formats(worksheet_past, 'E2:E{}'.format(len(results_df) + 1), accuracy_formats)
+            apply_accuracy_conditional_formats(worksheet_past, 'I2:I{}'.format(len(results_df) + 1), accuracy_formats)
 
         if not future_results_df.empty:
             # Ensure percentage columns are properly formatted as decimals
@@ -400,23 +400,16 @@ def create_excel_download(results_df, future_results_df, base_filename, past_acc
             worksheet_future.set_column('E:E', None, format_percent)  # Percentage
             worksheet_future.set_column('I:I', None, format_percent)  # Percentage
 
-            # Apply simplified conditional formatting to percentages in columns E and I
-            worksheet_future.conditional_format('E2:E{}'.format(len(future_results_df) + 1),
-                                                {'type': 'cell', 'criteria': '<', 'value': 0.96, 'format': format_red})
-            worksheet_future.conditional_format('E2:E{}'.format(len(future_results_df) + 1),
-                                                {'type': 'cell', 'criteria': 'between', 'minimum': 0.96, 'maximum': 0.9799, 'format': format_yellow})
-            worksheet_future.conditional_format('E2:E{}'.format(len(future_results_df) + 1),
-                                                {'type': 'cell', 'criteria': '>=', 'value': 0.98, 'format': format_green})
-
-            worksheet_future.conditional_format('I2:I{}'.format(len(future_results_df) + 1),
-                                                {'type': 'cell', 'criteria': '<', 'value': 0.96, 'format': format_red})
-            worksheet_future.conditional_format('I2:I{}'.format(len(future_results_df) + 1),
-                                                {'type': 'cell', 'criteria': 'between', 'minimum': 0.96, 'maximum': 0.9799, 'format': format_yellow})
-            worksheet_future.conditional_format('I2:I{}'.format(len(future_results_df) + 1),
-                                                {'type': 'cell', 'criteria': '>=', 'value': 0.98, 'format': format_green})
+            # Apply conditional formatting to percentages in columns E and I
+            apply_accuracy_conditional_formats(worksheet_future, 'E2:E{}'.format(len(future_results_df) + 1), accuracy_formats)
+            apply_accuracy_conditional_formats(worksheet_future, 'I2:I{}'.format(len(future_results_df) + 1), accuracy_formats)
     output.seek(0)
     return output, base_filename
 
+# Identify an uploaded file so a cached workbook can be tied to the inputs it was built from
+def upload_key(file):
+    return None if file is None else (file.file_id, file.name, file.size)
+
 st.title('Hilton Accuracy Check Tool')
 
 csv_file = st.file_uploader("Upload Daily Totals Extract (.csv)", type="csv")
@@ -433,13 +426,18 @@ if excel_file_2:
     apply_vat = st.checkbox("Apply VAT deduction to IDeaS revenue?", value=False)
     if apply_vat:
         vat_rate = st.number_input("Enter VAT rate (%)", min_value=0.0, value=0.0, step=0.1)
+    else:
+        vat_rate = None
 else:
     apply_vat = False
     vat_rate = None
 
 perspective_date = st.date_input("Enter perspective date (Date of the IDeaS file receipt and Support UI extract):", value=datetime.now().date())
 
+download_inputs = (upload_key(csv_file), upload_key(excel_file), upload_key(excel_file_2), inncode, apply_vat, vat_rate, perspective_date)
+
 if st.button("Process"):
+    st.session_state.pop('excel_download', None)
     with st.spinner('Processing...'):
         results_df, past_accuracy_rn, past_accuracy_rev, future_results_df, future_accuracy_rn, future_accuracy_rev = dynamic_process_files(
             csv_file, excel_file, excel_file_2, inncode, perspective_date, apply_vat, vat_rate
@@ -456,10 +454,23 @@ if st.button("Process"):
                 past_accuracy_rn, past_accuracy_rev, 
                 future_accuracy_rn, future_accuracy_rev
             )
-            
-            st.download_button(
-                label="Download results as Excel",
-                data=excel_data,
-                file_name=f"{base_filename}_Accuracy_Results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+            # Keep the workbook in the session so reruns (e.g. clicking download) don't rebuild it
+            st.session_state['excel_download'] = (
+                download_inputs,
+                excel_data.getvalue(),
+                f"{base_filename}_Accuracy_Results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
             )
+
+# Drop a cached workbook once the files or parameters it was built from change
+if 'excel_download' in st.session_state and st.session_state['excel_download'][0] != download_inputs:
+    del st.session_state['excel_download']
+
+if 'excel_download' in st.session_state:
+    _, excel_bytes, download_filename = st.session_state['excel_download']
+    st.download_button(
+        label="Download results as Excel",
+        data=excel_bytes,
+        file_name=download_filename,
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
@@ -1,10 +1,229 @@
 import streamlit as st
 import pandas as pd
 import json
+import os
+import re
+import io
+import glob
+import mmap
+import codecs
+import contextlib
 
 # Set the layout to wide
 st.set_page_config(layout="wide")
 
+# Number of LEDGER lines aggregated at a time in chunked mode
+LEDGER_CHUNK_SIZE = 100000
+LEDGER_REVENUE_COLUMNS = ['extract_type', 'business_date', 'inncode', 'charge_category', 'accounting_category', 'ledger_entry_amount']
+# Bytes read at a time when streaming JSON records
+JSON_BLOCK_SIZE = 1 << 20
+JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+class LocalJSONFile:
+    # A JSON extract that already sits on the server, read through a memory map instead of an upload
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+
+    def read_text(self):
+        with open(self.path, "rb") as f:
+            # Empty files can't be mapped, let the JSON parser report them instead
+            if os.fstat(f.fileno()).st_size == 0:
+                return ""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                # Decode straight from the mapped pages, without copying them into a bytes object first
+                return str(mapped, "utf-8")
+
+def local_files_root():
+    # Server-side ingestion is limited to this directory, set through ONQ_EXTRACTS_DIR or onq_extracts_dir in st.secrets
+    root = os.environ.get("ONQ_EXTRACTS_DIR")
+    if not root:
+        try:
+            root = st.secrets.get("onq_extracts_dir")
+        except FileNotFoundError:
+            root = None
+    return os.path.realpath(os.path.expanduser(root)) if root else None
+
+def list_local_files(root, location, filter_criteria):
+    # Relative locations are taken from the root; a directory means every JSON file in it, anything else is a glob pattern
+    location = os.path.join(root, os.path.expanduser(location))
+    pattern = os.path.join(location, "*.json") if os.path.isdir(location) else location
+
+    paths = []
+    for path in glob.glob(pattern):
+        # Resolve symlinks and '..' so nothing outside the root, or other than a .json file, is ever opened
+        real_path = os.path.realpath(path)
+        if os.path.commonpath([root, real_path]) == root and real_path.lower().endswith(".json") and os.path.isfile(real_path):
+            paths.append(real_path)
+    paths = sorted(set(paths))
+
+    # Apply the Name Filter to the filenames before any file is opened
+    if filter_criteria:
+        name_pattern = re.compile('|'.join(filter_criteria.split(',')))
+        paths = [path for path in paths if name_pattern.search(os.path.basename(path))]
+
+    return [LocalJSONFile(path) for path in paths]
+
+def file_key(file):
+    # Identify an input file so cached results can be tied to the files they were built from
+    if isinstance(file, LocalJSONFile):
+        try:
+            stat = os.stat(file.path)
+        except OSError:
+            return (file.path, None, None)
+        return (file.path, stat.st_mtime_ns, stat.st_size)
+    return (file.file_id, file.name, file.size)
+
+def read_json_text(file):
+    if isinstance(file, LocalJSONFile):
+        return file.read_text()
+    return file.read().decode("utf-8")
+
+def read_json_file(file):
+    return json.loads(read_json_text(file))
+
+@contextlib.contextmanager
+def open_json_stream(file):
+    # Binary stream over a file's JSON, read block by block by iter_json_records
+    if not isinstance(file, LocalJSONFile):
+        file.seek(0)
+        yield file
+        return
+    with open(file.path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield io.BytesIO()
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+def iter_json_records(stream, block_size=JSON_BLOCK_SIZE):
+    # Yield the records of a top-level JSON array one at a time. The stream is decoded in fixed-size
+    # blocks, so only the current block and a partly read record are ever held in memory.
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    idx = 0
+    eof = False
+
+    def fill():
+        # Drop the text already consumed and append the next decoded block
+        nonlocal buffer, idx, eof
+        block = stream.read(block_size)
+        eof = not block
+        buffer = buffer[idx:] + text_decoder.decode(block, final=eof)
+        idx = 0
+
+    def skip_whitespace():
+        nonlocal idx
+        while True:
+            idx = JSON_WHITESPACE.match(buffer, idx).end()
+            if idx < len(buffer) or eof:
+                return
+            fill()
+
+    skip_whitespace()
+    if not buffer.startswith('[', idx):
+        # Not an array, so parse the whole document as json.loads would and yield it as one record
+        while not eof:
+            fill()
+        yield json.loads(buffer[idx:])
+        return
+
+    idx += 1
+    skip_whitespace()
+    if buffer.startswith(']', idx):
+        idx += 1
+    else:
+        while True:
+            try:
+                record, end = decoder.raw_decode(buffer, idx)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # A value cut at a block boundary can decode early, e.g. '1' from '1.5' or '1e5', so only
+            # accept it once the ',' or ']' that follows it is in the buffer
+            if not eof and not buffer.startswith((',', ']'), JSON_WHITESPACE.match(buffer, end).end()):
+                fill()
+                continue
+
+            idx = end
+            yield record
+
+            skip_whitespace()
+            if buffer.startswith(']', idx):
+                idx += 1
+                break
+            if not buffer.startswith(',', idx):
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, idx)
+            idx += 1
+            skip_whitespace()
+
+    # Only whitespace may follow the closing bracket, as with json.loads
+    skip_whitespace()
+    if idx < len(buffer):
+        raise json.JSONDecodeError("Extra data", buffer, idx)
+
+def iter_chunks(records, chunk_size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def aggregate_ledger_revenue_chunked(records, inncode_filter, chunk_size=LEDGER_CHUNK_SIZE):
+    # Running (sum, compensation) per (business_date, inncode), so memory is bounded by the number of keys
+    totals = {}
+    float_amounts = False
+    is_ledger = None
+
+    for chunk in iter_chunks(records, chunk_size):
+        # Only the columns needed for the revenue roll-up are materialised, as the original Python values
+        df = pd.DataFrame(chunk, columns=LEDGER_REVENUE_COLUMNS, dtype=object)
+        if is_ledger is None:
+            is_ledger = df['extract_type'][0] == 'LEDGER'
+        if not is_ledger:
+            return None
+
+        df['ledger_entry_amount'] = pd.to_numeric(df['ledger_entry_amount'], errors='coerce')
+        float_amounts = float_amounts or df['ledger_entry_amount'].dtype.kind == 'f'
+
+        # Filter for revenue only
+        df_filtered_revenue = df[(df['charge_category'] == 'R') | (df['accounting_category'] == 'RA')]
+        if inncode_filter:
+            df_filtered_revenue = df_filtered_revenue[df_filtered_revenue['inncode'] == inncode_filter]
+        df_filtered_revenue = df_filtered_revenue.dropna(subset=['business_date', 'inncode'])
+
+        # Same compensated (Kahan) summation, in the same row order, as pandas' groupby sum so the totals
+        # match exactly. Mirrors group_sum in pandas/_libs/groupby.pyx (pandas >= 1.3, checked against 3.0)
+        keys = zip(df_filtered_revenue['business_date'].tolist(), df_filtered_revenue['inncode'].tolist())
+        for key, amount in zip(keys, df_filtered_revenue['ledger_entry_amount'].tolist()):
+            state = totals.setdefault(key, [0, 0])
+            if amount != amount:
+                continue
+            adjusted = amount - state[1]
+            new_total = state[0] + adjusted
+            compensation = new_total - state[0] - adjusted
+            # An infinite amount leaves the compensation undefined
+            state[1] = 0 if compensation != compensation else compensation
+            state[0] = new_total
+
+    if is_ledger is None:
+        return None
+
+    df_agg_revenue = pd.DataFrame(
+        [(business_date, inncode, total) for (business_date, inncode), (total, _) in totals.items()],
+        columns=['business_date', 'inncode', 'Ledger_Entry_Amount']
+    )
+    # Sorted through pandas, which copes with mixed key types (e.g. an inncode of 1 next to 'A') like groupby does
+    df_agg_revenue = df_agg_revenue.sort_values(['business_date', 'inncode'], ignore_index=True)
+    df_agg_revenue['Ledger_Entry_Amount'] = df_agg_revenue['Ledger_Entry_Amount'].astype(float if float_amounts else 'int64')
+    return df_agg_revenue
+
 class FileProcessorApp:
     def __init__(self):
         self.file_paths = []  # This will hold the uploaded files
@@ -15,11 +234,27 @@ class FileProcessorApp:
     def display_header(self):
         st.title("Hilton ONQ File Processing Tool")
 
-    def upload_files(self):
+    def upload_files(self, filter_criteria):
+        # The server folder option is only offered when an extracts directory has been configured
+        root = local_files_root()
+        if root and st.radio("File source", ["Upload files", "Server folder"], horizontal=True) == "Server folder":
+            location = st.text_input(f"Folder or glob pattern under {root} (e.g. extracts or extracts/*LEDGER*.json):")
+            try:
+                self.file_paths = list_local_files(root, location, filter_criteria) if location else []
+            except re.error as e:
+                st.error(f"Invalid Name Filter: {e}")
+                self.file_paths = []
+                return
+            if self.file_paths:
+                st.success(f"Found {len(self.file_paths)} files.")
+            elif location:
+                st.warning("No JSON files found for that folder or pattern.")
+            return
+
         # Make the uploader full-width and keep it at the top
         uploaded_files = st.file_uploader("Upload JSON files", type="json", accept_multiple_files=True, label_visibility="visible")
+        self.file_paths = uploaded_files or []
         if uploaded_files:
-            self.file_paths = uploaded_files
             st.success(f"Uploaded {len(uploaded_files)} files.")
 
     def process_files(self, filter_criteria, inncode_filter, raw_data_container):
@@ -28,8 +263,7 @@ class FileProcessorApp:
         for uploaded_file in self.file_paths:
             try:
                 # Read file content as a JSON object
-                file_content = uploaded_file.read().decode("utf-8")
-                data = json.loads(file_content)
+                data = read_json_file(uploaded_file)
                 df = pd.json_normalize(data)
 
                 # Add a new column to store the filename
@@ -195,13 +429,19 @@ class FileProcessorApp:
         else:
             st.warning("No data matched the filter criteria.")
 
-    def process_room_revenue(self, filter_criteria, inncode_filter, revenue_data_container):
+    def process_room_revenue(self, filter_criteria, inncode_filter, revenue_data_container, chunked=False):
         room_revenue_data_frames = []
 
         for uploaded_file in self.file_paths:
             try:
-                file_content = uploaded_file.read().decode("utf-8")
-                data = json.loads(file_content)
+                if chunked:
+                    with open_json_stream(uploaded_file) as stream:
+                        df_agg_revenue = aggregate_ledger_revenue_chunked(iter_json_records(stream), inncode_filter)
+                    if df_agg_revenue is not None:
+                        room_revenue_data_frames.append(df_agg_revenue)
+                    continue
+
+                data = read_json_file(uploaded_file)
                 df = pd.json_normalize(data)
 
                 if 'extract_type' in df.columns and df['extract_type'][0] == 'LEDGER':
@@ -236,25 +476,46 @@ class FileProcessorApp:
             # Deduplicate by Business Date and Inncode if necessary
             self.room_revenue_data = self.room_revenue_data.drop_duplicates(subset=['business_date', 'inncode'])
 
-            # Display Room Revenue Data in its own container
-            with revenue_data_container:
-                st.write("### Room Revenue Data")
-                st.dataframe(self.room_revenue_data, use_container_width=True)
+            # Keep only the small aggregated result in the session, so reruns can show it without reprocessing
+            st.session_state['room_revenue'] = (self.room_revenue_key(inncode_filter, chunked), self.room_revenue_data)
+            self.display_room_revenue(revenue_data_container)
         else:
+            st.session_state.pop('room_revenue', None)
             st.warning("No data matched the filter criteria or there is no room revenue data.")
 
+    def room_revenue_key(self, inncode_filter, chunked):
+        return (tuple(file_key(file) for file in self.file_paths), inncode_filter, chunked)
+
+    def restore_room_revenue(self, inncode_filter, chunked, revenue_data_container):
+        cached = st.session_state.get('room_revenue')
+        if cached is None:
+            return
+        # Drop the cached result once the files or options it was built from change
+        if cached[0] != self.room_revenue_key(inncode_filter, chunked):
+            del st.session_state['room_revenue']
+            return
+        self.room_revenue_data = cached[1]
+        self.display_room_revenue(revenue_data_container)
+
+    def display_room_revenue(self, revenue_data_container):
+        # Display Room Revenue Data in its own container
+        with revenue_data_container:
+            st.write("### Room Revenue Data")
+            st.dataframe(self.room_revenue_data, use_container_width=True)
+
 # Main Streamlit app
 def main():
     app = FileProcessorApp()
 
-    # Keep the file uploader at the top
-    app.display_header()
-    app.upload_files()
-
     st.sidebar.title("Options")
 
     filter_criteria = st.sidebar.text_input("Name Filter (e.g., LEDGER):")
     inncode_filter = st.sidebar.text_input("Enter Inncode:")
+    chunked_revenue = st.sidebar.checkbox("Chunked LEDGER aggregation (large history)", value=False)
+
+    # Keep the file uploader at the top
+    app.display_header()
+    app.upload_files(filter_criteria)
 
     # Define placeholders for the two outputs
     raw_data_container = st.container()
@@ -266,7 +527,9 @@ def main():
 
     if st.sidebar.button("Process LEDGER Room Rev by Day"):
         with st.spinner('Processing...'):
-            app.process_room_revenue(filter_criteria, inncode_filter, revenue_data_container)
+            app.process_room_revenue(filter_criteria, inncode_filter, revenue_data_container, chunked=chunked_revenue)
+    else:
+        app.restore_room_revenue(inncode_filter, chunked_revenue, revenue_data_container)
 
 if __name__ == "__main__":
     main()
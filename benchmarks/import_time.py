@@ -0,0 +1,215 @@
+"""Measure start-up, processing and rerun time of the Streamlit apps.
+
+Each app is driven through Streamlit's AppTest with small generated fixture
+files, in a fresh interpreter per run:
+
+    cold          first run of the empty page
+    process       upload the fixtures and click Process
+    rerun         median of plain reruns after processing (any widget change)
+    results again a rerun after processing until the results are on screen
+                  again; apps that don't keep them have to process again
+    kept          whether the results survived the rerun
+
+Deferred imports are timed separately with ``python -X importtime`` in an
+interpreter that has already imported streamlit, as the Streamlit server has.
+Baseline and working-tree runs are interleaved so machine drift affects both.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --baseline <git revision>
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import date, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APPS = {"HILTON_ACCURACY_CHECKER.py": "accuracy", "HILTON_FILE_PROCESSOR.py": "ledger"}
+
+# Modules the accuracy checker imported at start-up and now loads only when needed
+DEFERRED_MODULES = ["pandas", "numpy", "plotly.graph_objects", "plotly.subplots", "xlsxwriter", "zipfile"]
+
+# Runs in a child interpreter so module caches start empty
+MEASURE_SCRIPT = """
+import json, os, statistics, sys, time
+from streamlit.testing.v1 import AppTest
+
+path, scenario, fixtures, reruns = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4])
+app = AppTest.from_file(path, default_timeout=300)
+
+def timed(action):
+    start = time.perf_counter()
+    action()
+    return time.perf_counter() - start
+
+def read(name):
+    with open(os.path.join(fixtures, name), "rb") as f:
+        return f.read()
+
+def widget(kind, label):
+    return next(element for element in getattr(app, kind) if element.label.startswith(label))
+
+def run():
+    app.run()
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+
+result = {"cold": timed(run)}
+
+if scenario == "accuracy":
+    widget("file_uploader", "Upload Daily Totals").set_value(("HOTEL_daily.csv", read("daily.csv"), "text/csv"))
+    run()
+    widget("file_uploader", "Upload Operational").set_value(("operational.xlsx", read("operational.xlsx"), "application/octet-stream"))
+    run()
+    widget("text_input", "Enter Inncode").input("ABCDE")
+    run()
+    process_label = "Process"
+    results_shown = lambda: len(app.get("download_button")) > 0
+else:
+    widget("file_uploader", "Upload JSON").set_value([("HOTEL_LEDGER.json", read("ledger.json"), "application/json")])
+    run()
+    process_label = "Process LEDGER Room Rev by Day"
+    results_shown = lambda: len(app.dataframe) > 0
+
+def process():
+    next(button for button in app.button if button.label == process_label).click()
+    run()
+
+result["process"] = timed(process)
+assert results_shown(), "processing produced no results"
+
+result["rerun"] = statistics.median(timed(run) for _ in range(reruns))
+
+def results_again():
+    run()
+    if not results_shown():
+        process()
+
+run()
+result["kept"] = results_shown()
+process()
+result["results_again"] = timed(results_again)
+
+print(json.dumps(result))
+"""
+
+
+def write_fixtures(directory, days=90):
+    import pandas as pd
+
+    today = date.today()
+    past = [today - timedelta(days=offset) for offset in range(days, 0, -1)]
+    future = [today + timedelta(days=offset) for offset in range(1, days + 1)]
+
+    pd.DataFrame({
+        "arrivalDate": [day.isoformat() for day in past + future],
+        "rn": [100 + index % 20 for index in range(2 * days)],
+        "revNet": [12000.0 + 37.5 * (index % 20) for index in range(2 * days)],
+    }).to_csv(os.path.join(directory, "daily.csv"), index=False)
+
+    operational = pd.DataFrame({
+        "Business Date": pd.to_datetime(past),
+        "Inncode": "ABCDE",
+        "Hotel Name": "Benchmark Hotel",
+        "SOLD": [99 + index % 20 for index in range(days)],
+        "Rev": [11900.0 + 37.5 * (index % 20) for index in range(days)],
+    })
+    with pd.ExcelWriter(os.path.join(directory, "operational.xlsx"), engine="openpyxl") as writer:
+        operational.to_excel(writer, index=False, startrow=2)
+
+    ledger = [
+        {
+            "extract_type": "LEDGER",
+            "business_date": past[index % days].isoformat(),
+            "inncode": "ABCDE",
+            "charge_category": "R" if index % 3 else "X",
+            "accounting_category": "RA" if index % 5 == 0 else "XX",
+            "ledger_entry_amount": f"{(index % 400) * 1.25:.2f}",
+            "trans_desc": "Room charge",
+        }
+        for index in range(20000)
+    ]
+    with open(os.path.join(directory, "ledger.json"), "w") as f:
+        json.dump(ledger, f)
+
+
+def run_child(*args):
+    completed = subprocess.run([sys.executable, *args], capture_output=True, text=True)
+    if completed.returncode:
+        raise RuntimeError(completed.stderr)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def measure(paths, scenario, fixtures, runs, reruns):
+    results = {path: [] for path in paths}
+    for _ in range(runs):
+        for path in paths:
+            results[path].append(run_child("-c", MEASURE_SCRIPT, path, scenario, fixtures, str(reruns)))
+    return {
+        path: {
+            **{name: statistics.median(result[name] for result in path_results)
+               for name in ("cold", "process", "rerun", "results_again")},
+            "kept": all(result["kept"] for result in path_results),
+        }
+        for path, path_results in results.items()
+    }
+
+
+def deferred_import_time(module, runs):
+    # Cumulative -X importtime of a module once streamlit is loaded, in microseconds
+    timings = []
+    for _ in range(runs):
+        stderr = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import streamlit; import {module}"],
+            check=True, capture_output=True, text=True
+        ).stderr
+        cumulative = 0
+        for line in stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].strip() == module:
+                cumulative = int(fields[1])
+        timings.append(cumulative)
+    return statistics.median(timings)
+
+
+def checkout_app(revision, app, directory):
+    source = subprocess.run(
+        ["git", "show", f"{revision}:{app}"], check=True, capture_output=True, text=True, cwd=REPO_ROOT
+    ).stdout
+    path = os.path.join(directory, f"{revision.replace('/', '_')}_{app}")
+    with open(path, "w") as f:
+        f.write(source)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", help="git revision to compare the working tree against")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per app")
+    parser.add_argument("--reruns", type=int, default=10, help="reruns timed per interpreter")
+    args = parser.parse_args()
+
+    print("Deferred imports, after streamlit (-X importtime, cumulative)")
+    for module in DEFERRED_MODULES:
+        print(f"  {module:<22} {deferred_import_time(module, args.runs) / 1000:>8.1f} ms")
+    print()
+
+    print(f"{'app':<28} {'version':<10} {'cold':>8} {'process':>9} {'rerun':>8} {'results again':>14} {'kept':>5}  (ms)")
+    with tempfile.TemporaryDirectory() as directory:
+        write_fixtures(directory)
+        for app, scenario in APPS.items():
+            versions = [("working", os.path.join(REPO_ROOT, app))]
+            if args.baseline:
+                versions.insert(0, (args.baseline, checkout_app(args.baseline, app, directory)))
+            results = measure([path for _, path in versions], scenario, directory, args.runs, args.reruns)
+            for version, path in versions:
+                result = results[path]
+                print(f"{app:<28} {version[:10]:<10} {result['cold'] * 1000:>8.1f} {result['process'] * 1000:>9.1f} "
+                      f"{result['rerun'] * 1000:>8.1f} {result['results_again'] * 1000:>14.1f} {str(result['kept']):>5}")
+
+
+if __name__ == "__main__":
+    main()
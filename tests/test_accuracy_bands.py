@@ -0,0 +1,72 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import HILTON_ACCURACY_CHECKER as checker
+
+LOW, HIGH = checker.ACCURACY_THRESHOLDS
+RED, YELLOW, GREEN = checker.ACCURACY_COLORS
+
+# Values on and either side of each threshold
+EDGE_VALUES = [0.0, np.nextafter(LOW, 0), LOW, np.nextafter(HIGH, 0), HIGH, 1.0]
+EDGE_COLORS = [RED, RED, YELLOW, YELLOW, GREEN, GREEN]
+
+
+class RecordingWorksheet:
+    def __init__(self):
+        self.rules = []
+
+    def conditional_format(self, cell_range, options):
+        self.rules.append(options)
+
+
+def excel_color(rules, value):
+    # Excel applies the first matching rule in priority order, which is the order they were added
+    # in, and compares blank cells as zero
+    value = 0.0 if np.isnan(value) else value
+    for rule in rules:
+        if rule['criteria'] == '>=' and value >= rule['value']:
+            return rule['format']
+        if rule['criteria'] == '<' and value < rule['value']:
+            return rule['format']
+    return None
+
+
+def test_styler_bands_follow_thresholds():
+    styles = checker.accuracy_band_styles(pd.Series(EDGE_VALUES))
+
+    assert list(styles) == [f'background-color: {color}' for color in EDGE_COLORS]
+
+
+def test_missing_values():
+    column = pd.Series([np.nan, HIGH])
+
+    assert list(checker.accuracy_band_styles(column)) == [f'background-color: {RED}', f'background-color: {GREEN}']
+    assert list(checker.accuracy_band_styles(column, color_missing=False)) == ['', f'background-color: {GREEN}']
+
+
+@pytest.mark.parametrize("value", EDGE_VALUES + [np.nan, 0.97996])
+def test_excel_rules_match_styler(value):
+    worksheet = RecordingWorksheet()
+    checker.apply_accuracy_conditional_formats(worksheet, 'E2:E10', checker.ACCURACY_COLORS)
+
+    styler_color = checker.accuracy_band_styles(pd.Series([value]))[0]
+
+    assert styler_color == f'background-color: {excel_color(worksheet.rules, value)}'
+
+
+def test_matrix_colours_the_unrounded_value():
+    # 97.996% displays as 98.00% but is still in the yellow band, as in the Excel export
+    matrix = pd.DataFrame({'Past': [0.97996], 'Future': [np.nan]})
+
+    html = matrix.style.format('{:.2%}', na_rep='N/A').apply(
+        checker.accuracy_band_styles, color_missing=False
+    ).to_html()
+
+    assert '98.00%' in html and 'N/A' in html
+    assert YELLOW in html and GREEN not in html and RED not in html
@@ -0,0 +1,128 @@
+import builtins
+import json
+import os
+import re
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import HILTON_FILE_PROCESSOR as processor
+
+
+@pytest.fixture
+def extracts(tmp_path):
+    # A configured root with one subfolder, next to a folder outside it
+    root = tmp_path / "root"
+    folder = root / "extracts"
+    outside = tmp_path / "outside"
+    folder.mkdir(parents=True)
+    outside.mkdir()
+
+    (folder / "H1_LEDGER.json").write_text('[{"extract_type": "LEDGER"}]')
+    (folder / "H1_STAY.json").write_text('[{"extract_type": "STAY"}]')
+    (folder / "notes.txt").write_text("not json")
+    (root / "top_LEDGER.json").write_text("[]")
+    (outside / "secret.json").write_text('[{"password": "x"}]')
+    (folder / "link_LEDGER.json").symlink_to(outside / "secret.json")
+    (folder / "link_dir").symlink_to(outside, target_is_directory=True)
+
+    return str(os.path.realpath(root)), str(outside)
+
+
+def names(files):
+    return [file.name for file in files]
+
+
+def test_local_files_root_from_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv("ONQ_EXTRACTS_DIR", str(tmp_path / "a" / ".." / "b"))
+    assert processor.local_files_root() == os.path.realpath(tmp_path / "b")
+
+    monkeypatch.delenv("ONQ_EXTRACTS_DIR")
+    assert processor.local_files_root() is None
+
+
+def test_directory_lists_only_json_files_inside_root(extracts):
+    root, _ = extracts
+
+    assert names(processor.list_local_files(root, "extracts", "")) == ["H1_LEDGER.json", "H1_STAY.json"]
+
+
+def test_glob_skips_non_json_matches(extracts):
+    root, _ = extracts
+
+    assert names(processor.list_local_files(root, "extracts/*", "")) == ["H1_LEDGER.json", "H1_STAY.json"]
+
+
+@pytest.mark.parametrize("location", ["..", "../outside", "../*/secret.json", "extracts/../../outside/*.json",
+                                      "extracts/link_dir", "extracts/link_dir/*.json"])
+def test_parent_and_symlinked_paths_are_rejected(extracts, location):
+    root, _ = extracts
+
+    assert processor.list_local_files(root, location, "") == []
+
+
+def test_absolute_paths_must_stay_inside_root(extracts):
+    root, outside = extracts
+
+    assert processor.list_local_files(root, outside, "") == []
+    assert processor.list_local_files(root, os.path.join(outside, "secret.json"), "") == []
+    assert names(processor.list_local_files(root, os.path.join(root, "extracts"), "")) == ["H1_LEDGER.json", "H1_STAY.json"]
+
+
+def test_home_directory_is_expanded(extracts, monkeypatch):
+    root, outside = extracts
+
+    monkeypatch.setenv("HOME", root)
+    assert names(processor.list_local_files(root, "~/extracts", "")) == ["H1_LEDGER.json", "H1_STAY.json"]
+
+    monkeypatch.setenv("HOME", outside)
+    assert processor.list_local_files(root, "~", "") == []
+
+
+def test_name_filter_is_applied_without_opening_files(extracts, monkeypatch):
+    root, _ = extracts
+
+    def no_open(*args, **kwargs):
+        raise AssertionError("list_local_files opened a file")
+
+    monkeypatch.setattr(builtins, "open", no_open)
+    files = processor.list_local_files(root, "extracts", "LEDGER,top")
+
+    assert names(files) == ["H1_LEDGER.json"]
+
+
+def test_invalid_name_filter_raises_re_error(extracts):
+    root, _ = extracts
+
+    with pytest.raises(re.error):
+        processor.list_local_files(root, "extracts", "LEDGER(")
+
+
+def test_invalid_name_filter_shows_error_in_app(extracts, monkeypatch):
+    from streamlit.testing.v1 import AppTest
+
+    root, _ = extracts
+    monkeypatch.setenv("ONQ_EXTRACTS_DIR", root)
+    app = AppTest.from_file(os.path.join(REPO_ROOT, "HILTON_FILE_PROCESSOR.py"), default_timeout=60).run()
+    app.radio[0].set_value("Server folder").run()
+    next(text for text in app.text_input if text.label.startswith("Name Filter")).input("LEDGER(")
+    next(text for text in app.text_input if text.label.startswith("Folder")).input("extracts").run()
+
+    assert not app.exception
+    assert len(app.error) == 1 and app.error[0].value.startswith("Invalid Name Filter:")
+
+
+def test_read_text_handles_empty_and_multibyte_files(tmp_path):
+    empty = tmp_path / "empty.json"
+    empty.write_bytes(b"")
+    multibyte = tmp_path / "multibyte.json"
+    data = [{"hotel": "Zürich ✓ 東京", "guest": "Łódź"}]
+    multibyte.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+    assert processor.LocalJSONFile(str(empty)).read_text() == ""
+    with pytest.raises(json.JSONDecodeError):
+        processor.read_json_file(processor.LocalJSONFile(str(empty)))
+    assert processor.read_json_file(processor.LocalJSONFile(str(multibyte))) == data
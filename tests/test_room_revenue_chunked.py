@@ -0,0 +1,175 @@
+import io
+import json
+import os
+import random
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import HILTON_FILE_PROCESSOR as processor
+
+
+def in_memory_room_revenue(data, inncode_filter):
+    # The in-memory path of FileProcessorApp.process_room_revenue
+    df = pd.json_normalize(data)
+    df['ledger_entry_amount'] = pd.to_numeric(df['ledger_entry_amount'], errors='coerce')
+    revenue_filter = (df['charge_category'] == 'R') | (df['accounting_category'] == 'RA')
+    df_filtered_revenue = df[revenue_filter]
+    if inncode_filter:
+        df_filtered_revenue = df_filtered_revenue[df_filtered_revenue['inncode'] == inncode_filter]
+    return df_filtered_revenue.groupby(['business_date', 'inncode']).agg(
+        Ledger_Entry_Amount=('ledger_entry_amount', 'sum')
+    ).reset_index()
+
+
+def random_ledger(seed, size):
+    rng = random.Random(seed)
+    amounts = [
+        lambda: round(rng.uniform(-500, 5000), 2),
+        lambda: str(round(rng.uniform(0, 300), 2)),
+        lambda: rng.randint(0, 100),
+        lambda: None,
+        lambda: "n/a",
+    ]
+    return [
+        {
+            "extract_type": "LEDGER",
+            "business_date": rng.choice([f"2024-01-{day:02d}" for day in range(1, 29)] + [None]),
+            "inncode": rng.choice(["AAA", "BBB", "CCC", 1, None]),
+            "charge_category": rng.choice(["R", "X", None]),
+            "accounting_category": rng.choice(["RA", "ZZ"]),
+            "ledger_entry_amount": rng.choice(amounts)(),
+            "folio": {"id": rng.randint(0, 10)},
+        }
+        for _ in range(size)
+    ]
+
+
+def chunked_room_revenue(data, inncode_filter, chunk_size, block_size=processor.JSON_BLOCK_SIZE):
+    stream = io.BytesIO(json.dumps(data, indent=2).encode("utf-8"))
+    records = processor.iter_json_records(stream, block_size=block_size)
+    return processor.aggregate_ledger_revenue_chunked(records, inncode_filter, chunk_size=chunk_size)
+
+
+def assert_same_totals(expected, actual):
+    assert expected['business_date'].tolist() == actual['business_date'].tolist()
+    assert expected['inncode'].tolist() == actual['inncode'].tolist()
+    # Exact equality, not approximate: the chunked sums must be bit-for-bit the groupby sums
+    assert expected['Ledger_Entry_Amount'].tolist() == actual['Ledger_Entry_Amount'].tolist()
+    assert expected['Ledger_Entry_Amount'].dtype == actual['Ledger_Entry_Amount'].dtype
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("chunk_size", [7, 256, 5000])
+def test_chunked_matches_in_memory_groupby(seed, chunk_size):
+    data = random_ledger(seed, 3000)
+    inncode_filter = "AAA" if seed % 2 else ""
+
+    assert_same_totals(
+        in_memory_room_revenue(data, inncode_filter),
+        chunked_room_revenue(data, inncode_filter, chunk_size, block_size=4096),
+    )
+
+
+def test_chunked_handles_mixed_inncode_types():
+    data = [
+        {"extract_type": "LEDGER", "business_date": "2024-01-02", "inncode": 1, "charge_category": "R",
+         "accounting_category": "X", "ledger_entry_amount": 10.5},
+        {"extract_type": "LEDGER", "business_date": "2024-01-01", "inncode": "A", "charge_category": "R",
+         "accounting_category": "X", "ledger_entry_amount": 2.25},
+        {"extract_type": "LEDGER", "business_date": "2024-01-01", "inncode": 1, "charge_category": "X",
+         "accounting_category": "RA", "ledger_entry_amount": "4"},
+    ]
+
+    assert_same_totals(in_memory_room_revenue(data, ""), chunked_room_revenue(data, "", chunk_size=1))
+
+
+@pytest.mark.parametrize("amount", [1, None])
+def test_chunked_keeps_groupby_dtype(amount):
+    data = [{"extract_type": "LEDGER", "business_date": "2024-01-01", "inncode": "A", "charge_category": "R",
+             "accounting_category": "X", "ledger_entry_amount": amount}]
+
+    assert_same_totals(in_memory_room_revenue(data, ""), chunked_room_revenue(data, "", chunk_size=10))
+
+
+def test_chunked_skips_non_ledger_files():
+    data = [{"extract_type": "STAY", "arrival_date": "2024-01-01"}]
+
+    assert chunked_room_revenue(data, "", chunk_size=10) is None
+
+
+@pytest.mark.parametrize("block_size", [1, 3, 7, 64, processor.JSON_BLOCK_SIZE])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_iter_json_records_matches_json_loads(block_size, indent):
+    data = [
+        {"name": "Zürich ✓ 東京", "amount": 12345.678, "nested": {"list": [1, 2, [3]]}},
+        123456789,
+        1.5,
+        10.75,
+        -3.5e-2,
+        1e5,
+        2.25E+10,
+        0.0,
+        "text with \"quotes\" and , commas ]",
+        None,
+        True,
+        [],
+        {},
+    ]
+    text = json.dumps(data, indent=indent, ensure_ascii=False)
+
+    records = processor.iter_json_records(io.BytesIO(text.encode("utf-8")), block_size=block_size)
+
+    assert list(records) == json.loads(text)
+
+
+@pytest.mark.parametrize("text, expected", [("[]", []), (" [ ] \n", []), ('{"a": 1}', [{"a": 1}]), ("[1]", [1])])
+def test_iter_json_records_edge_documents(text, expected):
+    assert list(processor.iter_json_records(io.BytesIO(text.encode("utf-8")), block_size=2)) == expected
+
+
+@pytest.mark.parametrize("block_size", range(1, 9))
+@pytest.mark.parametrize("text", ["[1.5, 2.25]", "[10.75]", "[1e5, 2]", "[-3.5E-2 , 0.0,123456789.125]\n"])
+def test_iter_json_records_top_level_numbers_across_blocks(text, block_size):
+    # A number split just after '.' or 'e' must not be taken as the shorter number before it
+    assert list(processor.iter_json_records(io.BytesIO(text.encode("utf-8")), block_size=block_size)) == json.loads(text)
+
+
+@pytest.mark.parametrize("text", ["", "[", "[1,]", "[1 2]", "[1] x", '[{"a": 1}', '{"a": 1} x'])
+def test_iter_json_records_rejects_invalid_json(text):
+    with pytest.raises(json.JSONDecodeError):
+        list(processor.iter_json_records(io.BytesIO(text.encode("utf-8")), block_size=3))
+
+
+def test_iter_json_records_reads_incrementally():
+    class CountingStream(io.BytesIO):
+        bytes_read = 0
+
+        def read(self, size=-1):
+            block = super().read(size)
+            self.bytes_read += len(block)
+            return block
+
+    stream = CountingStream(json.dumps(random_ledger(0, 2000)).encode("utf-8"))
+    records = processor.iter_json_records(stream, block_size=1024)
+
+    next(records)
+    assert stream.bytes_read <= 2 * 1024
+    assert len(stream.getvalue()) > 100 * 1024
+
+
+def test_open_json_stream_reads_local_files(tmp_path):
+    data = random_ledger(1, 50)
+    path = tmp_path / "extract_LEDGER.json"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    empty_path = tmp_path / "empty.json"
+    empty_path.write_text("")
+
+    with processor.open_json_stream(processor.LocalJSONFile(str(path))) as stream:
+        assert list(processor.iter_json_records(stream, block_size=100)) == data
+    with processor.open_json_stream(processor.LocalJSONFile(str(empty_path))) as stream:
+        with pytest.raises(json.JSONDecodeError):
+            list(processor.iter_json_records(stream))